@@ -7,20 +7,28 @@ from typing import Dict, Optional, Any, List, Tuple
 import asyncio
 import datetime
 from datetime import timezone
-from threading import Thread
 from collections import deque
 import signal
+import concurrent.futures
+import contextlib
+import threading
+import hashlib
 import sys
+import time
 from pathlib import Path
 from functools import wraps, lru_cache
+from dataclasses import dataclass
 
 # Third-party imports
 import discord
 import aiohttp
+import orjson
 from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ui import View, Button, Select
-from flask import Flask, jsonify
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import uvicorn
 import randfacts
 from dotenv import load_dotenv
 import python_weather
@@ -46,7 +54,7 @@ try:
             try:
                 discord.opus.load_opus(opus_lib)
                 if discord.opus.is_loaded():
-                    logging.info(f"Successfully loaded Opus from: {opus_lib}")
+                    logging.info("Successfully loaded Opus from: %s", opus_lib)
                     break
             except Exception:
                 continue
@@ -57,7 +65,13 @@ try:
 except ImportError as e:
     YT_DLP_AVAILABLE = False
     VOICE_AVAILABLE = False
-    logging.warning(f"yt-dlp or voice dependencies unavailable: {e}")
+    logging.warning("yt-dlp or voice dependencies unavailable: %s", e)
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 # ========== Configuration ==========
 class Config:
@@ -67,20 +81,46 @@ class Config:
     MAX_CITY_NAME_LENGTH = 100
     MIN_CITY_NAME_LENGTH = 1
     TRIVIA_CATEGORIES_API = "https://opentdb.com/api_category.php"
-    TRIVIA_API = "https://opentdb.com/api.php?amount=1&type=multiple"
+    TRIVIA_API = "https://opentdb.com/api.php?type=multiple"
+    TRIVIA_BATCH_SIZE = 10  # Questions fetched per opentdb request
+    TRIVIA_RATE_LIMIT_SECONDS = 5  # opentdb allows one request per IP every 5 seconds
     DAD_JOKE_API = "https://icanhazdadjoke.com/"
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     ADDED_WORDS_FILE = "addedwords.txt"
     LOG_FILE = "bot.log"
+    TREE_HASH_FILE = ".tree_hash"  # Fingerprint of the last synced command tree
     MAX_REQUESTS_PER_MINUTE = 30
     RATE_LIMIT_CLEANUP_THRESHOLD = 10000  # Clean when this many users tracked
     QUEUE_CLEANUP_HOURS = 1  # How often to clean inactive queues
+    TRIVIA_CATEGORIES_TTL = 86400  # Seconds before trivia categories are refetched
+    TRIVIA_CATEGORIES_RETRY = 300  # Seconds before retrying a failed category refresh
+
+# ========== Embed Constants ==========
+BLUE = discord.Color.blue()
+BLURPLE = discord.Color.blurple()
+DARK_BLUE = discord.Color.dark_blue()
+DARK_GRAY = discord.Color.dark_gray()
+DARK_RED = discord.Color.dark_red()
+GOLD = discord.Color.gold()
+GREEN = discord.Color.green()
+ORANGE = discord.Color.orange()
+RED = discord.Color.red()
+YELLOW = discord.Color.yellow()
+DEFAULT_WEATHER_EMOJI = "🌤️"
 
 # ========== Logging Setup ==========
 def setup_logging():
+    # Load .env first so LOG_LEVEL set there applies too
+    load_dotenv()
+    level_name = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+    level = int(level_name) if level_name.isdigit() else getattr(logging, level_name, None)
+    valid_level = isinstance(level, int)
+    if not valid_level:
+        level = logging.INFO
+    
     Path("logs").mkdir(exist_ok=True)
     logging.basicConfig(
-        level=logging.INFO,
+        level=level,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
         handlers=[
             logging.FileHandler(f"logs/{Config.LOG_FILE}"),
@@ -89,57 +129,92 @@ def setup_logging():
     )
     logging.getLogger("discord").setLevel(logging.WARNING)
     logging.getLogger("aiohttp").setLevel(logging.WARNING)
-    return logging.getLogger(__name__)
+    log = logging.getLogger(__name__)
+    if not valid_level:
+        log.warning("Unknown LOG_LEVEL %r, using INFO", level_name)
+    return log
 
 logger = setup_logging()
 
 # ========== Environment Setup ==========
-load_dotenv()
+@dataclass(frozen=True)
+class Settings:
+    discord_token: str
+    port: int
+    sync_guild_id: Optional[int] = None
+
+_TOKEN_RE = re.compile(r'[A-Za-z0-9._-]+')
 
 def validate_environment():
     token = os.getenv("DISCORD_TOKEN")
     if not token:
         logger.critical("Missing DISCORD_TOKEN environment variable.")
         sys.exit(1)
-    if not re.match(r'^[A-Za-z0-9._-]+$', token):
+    if not _TOKEN_RE.fullmatch(token):
         logger.critical("Invalid Discord token format.")
         sys.exit(1)
     return token
 
-DISCORD_TOKEN = validate_environment()
+def _int_env(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.critical("Invalid %s environment variable: %r is not an integer.", name, value)
+        sys.exit(1)
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Validate the environment once, on first use"""
+    return Settings(
+        discord_token=validate_environment(),
+        port=_int_env("PORT", 5000),
+        sync_guild_id=_int_env("SYNC_GUILD_ID")
+    )
 
-# ========== Flask App ==========
-app = Flask(__name__)
+# ========== Web App ==========
+app = FastAPI(title="Discord Bot", docs_url=None, redoc_url=None, openapi_url=None)
 
-@app.route('/')
-def home():
-    return jsonify({
+@app.get('/')
+async def home():
+    return {
         "status": "online",
         "bot_name": "Discord Bot",
         "version": "2.0",
         "timestamp": datetime.datetime.now(timezone.utc).isoformat()
-    })
+    }
 
-@app.route('/health')
-def health_check():
-    return jsonify({
+@app.get('/health')
+async def health_check():
+    return {
         "status": "healthy",
         "uptime": str(datetime.datetime.now(timezone.utc) - start_time) if 'start_time' in globals() else "unknown"
-    })
+    }
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"error": "Not found"}), 404
+@app.exception_handler(404)
+async def not_found(request, error):
+    return JSONResponse({"error": "Not found"}, status_code=404)
 
 # ========== Bot State ==========
 class BotState:
     def __init__(self):
         self.start_time = datetime.datetime.now(timezone.utc)
         self.http_session: Optional[aiohttp.ClientSession] = None
+        self.weather_client: Optional[python_weather.Client] = None
         self.music_queues: Dict[str, deque] = {}
         self.request_counts: Dict[int, List] = {}
         self.now_playing: Dict[str, Optional[str]] = {}
-        self.shutdown_event = asyncio.Event()
+        self.trivia_categories: Optional[List[Dict[str, Any]]] = None
+        self.categories_fetched_at = 0.0
+        self.categories_attempted_at: Optional[float] = None
+        # Created on first use so it binds to the running loop, not the import-time one (Python 3.8/3.9)
+        self.categories_lock: Optional[asyncio.Lock] = None
+        self.categories_task: Optional[asyncio.Task] = None
+        self.trivia_questions: Dict[Tuple[str, str], deque] = {}
+        self.trivia_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.trivia_unbatched: set = set()  # Pairs with too few questions for a full batch
         
     async def initialize(self):
         await self.get_http_session()
@@ -148,16 +223,30 @@ class BotState:
         """FIX: Simplified session management without unnecessary locking"""
         if self.http_session is None or self.http_session.closed:
             timeout = aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=75)
             self.http_session = aiohttp.ClientSession(
+                connector=connector,
                 timeout=timeout,
                 headers={'User-Agent': Config.USER_AGENT}
             )
         return self.http_session
     
+    async def get_weather_client(self) -> python_weather.Client:
+        """Shared weather client so /weather reuses one connection pool"""
+        if self.weather_client is None:
+            self.weather_client = python_weather.Client(unit=python_weather.IMPERIAL)
+        return self.weather_client
+    
     async def cleanup(self):
+        if self.categories_task and not self.categories_task.done():
+            self.categories_task.cancel()
         if self.http_session and not self.http_session.closed:
             await self.http_session.close()
             logger.info("HTTP session closed")
+        if self.weather_client is not None:
+            await self.weather_client.close()
+            self.weather_client = None
+            logger.info("Weather client closed")
     
     def is_rate_limited(self, user_id: int) -> bool:
         """FIX: Added memory leak protection with periodic cleanup"""
@@ -165,14 +254,14 @@ class BotState:
         
         # Memory leak fix: Clean up old entries when threshold reached
         if len(self.request_counts) > Config.RATE_LIMIT_CLEANUP_THRESHOLD:
-            logger.info(f"Cleaning up rate limit tracking (current size: {len(self.request_counts)})")
+            logger.info("Cleaning up rate limit tracking (current size: %s)", len(self.request_counts))
             cutoff = now - datetime.timedelta(hours=1)
             self.request_counts = {
                 uid: [ts for ts in timestamps if ts > cutoff]
                 for uid, timestamps in self.request_counts.items()
                 if any(ts > cutoff for ts in timestamps)
             }
-            logger.info(f"Rate limit cleanup complete (new size: {len(self.request_counts)})")
+            logger.info("Rate limit cleanup complete (new size: %s)", len(self.request_counts))
         
         if user_id not in self.request_counts:
             self.request_counts[user_id] = []
@@ -190,22 +279,22 @@ bot_state = BotState()
 start_time = bot_state.start_time
 
 # ========== Discord Bot Setup ==========
+# Only slash commands are used, so message events and content are never needed
 intents = discord.Intents.default()
-intents.messages = True
-intents.message_content = True
 intents.guilds = True
+intents.messages = False
 if VOICE_AVAILABLE:
     intents.voice_states = True
 
 bot = commands.Bot(
-    command_prefix="!",
+    command_prefix=commands.when_mentioned,
     intents=intents,
     help_command=None,
     case_insensitive=True
 )
 
 # ========== Utility Functions ==========
-def create_embed(title: str, description: str = None, color: discord.Color = discord.Color.blue(), **kwargs) -> discord.Embed:
+def create_embed(title: str, description: str = None, color: discord.Color = BLUE, **kwargs) -> discord.Embed:
     embed = discord.Embed(title=title, description=description, color=color)
     for key in ('author', 'footer', 'thumbnail', 'image'):
         if key in kwargs:
@@ -224,16 +313,18 @@ async def safe_api_request(url: str, params: dict = None, headers: dict = None)
                 # Check if response is JSON
                 content_type = response.headers.get('Content-Type', '')
                 if 'application/json' in content_type:
-                    return await response.json()
+                    return orjson.loads(await response.read())
                 else:
                     # Return text content wrapped in dict for non-JSON responses
                     text = await response.text()
                     return {"text": text, "status": response.status}
-            logger.error(f"API request failed: {url} returned {response.status}")
+            logger.error("API request failed: %s returned %s", url, response.status)
     except asyncio.TimeoutError:
-        logger.error(f"API request timeout: {url}")
+        logger.error("API request timeout: %s", url)
+    except orjson.JSONDecodeError as e:
+        logger.error("Invalid JSON from %s: %s", url, e)
     except Exception as e:
-        logger.error(f"API request error for {url}: {e}")
+        logger.error("API request error for %s: %s", url, e)
     return None
 
 @lru_cache(maxsize=128)
@@ -249,7 +340,7 @@ def rate_limit(func):
     @wraps(func)
     async def wrapper(interaction: discord.Interaction, *args, **kwargs):
         if bot_state.is_rate_limited(interaction.user.id):
-            embed = create_embed("Rate Limited", "You're making requests too quickly. Please wait.", discord.Color.red())
+            embed = create_embed("Rate Limited", "You're making requests too quickly. Please wait.", RED)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
         return await func(interaction, *args, **kwargs)
     return wrapper
@@ -271,15 +362,50 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
         'nocache': True,
     }
 
-    ytdl = yt_dlp.YoutubeDL(ytdl_format_options)
+    # Bounded pool so a burst of /play calls can't fan out into dozens of threads
+    ytdl_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="ytdl")
+    # YoutubeDL isn't thread-safe, so each worker thread keeps its own instances
+    _ydl_local = threading.local()
+    _ydl_instances: List[yt_dlp.YoutubeDL] = []
+    _ydl_instances_lock = threading.Lock()
+    
+    def _get_ydl(ydl_opts) -> yt_dlp.YoutubeDL:
+        """Return this thread's YoutubeDL for an option set, creating it on first use"""
+        cache = getattr(_ydl_local, "cache", None)
+        if cache is None:
+            cache = _ydl_local.cache = {}
+        key = tuple(sorted(ydl_opts.items()))
+        ydl = cache.get(key)
+        if ydl is None:
+            ydl = cache[key] = yt_dlp.YoutubeDL(ydl_opts)
+            with _ydl_instances_lock:
+                _ydl_instances.append(ydl)
+        return ydl
+    
+    def close_ytdl_instances():
+        """Close every cached YoutubeDL once the executor has stopped"""
+        with _ydl_instances_lock:
+            for ydl in _ydl_instances:
+                try:
+                    ydl.close()
+                except Exception as e:
+                    logger.error("Error closing yt-dlp instance: %s", e)
+            _ydl_instances.clear()
     
     async def search_ytdlp_async(query, ydl_opts):
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: _extract(query, ydl_opts))
+        return await loop.run_in_executor(ytdl_executor, _extract, query, ydl_opts)
 
-    def _extract(query, ydl_opts):
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(query, download=False)
+    def _extract(query, ydl_opts, download=False):
+        return _get_ydl(ydl_opts).extract_info(query, download=download)
+    
+    def _extract_source(url, stream):
+        """Extract a playable entry and resolve its filename on the same worker thread"""
+        data = _extract(url, ytdl_format_options, download=not stream)
+        if 'entries' in data:
+            data = data['entries'][0]
+        filename = data['url'] if stream else _get_ydl(ytdl_format_options).prepare_filename(data)
+        return data, filename
 
     class YTDLSource(discord.PCMVolumeTransformer):
         def __init__(self, source, *, data, volume=0.5):
@@ -294,15 +420,11 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
             loop = loop or asyncio.get_event_loop()
             
             try:
-                data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
+                data, filename = await loop.run_in_executor(ytdl_executor, _extract_source, url, stream)
             except Exception as e:
-                logger.error(f"yt-dlp extraction failed for {url}: {e}")
+                logger.error("yt-dlp extraction failed for %s: %s", url, e)
                 raise
             
-            if 'entries' in data:
-                data = data['entries'][0]
-            
-            filename = data['url'] if stream else ytdl.prepare_filename(data)
             ffmpeg_options = {
                 'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
                 'options': '-vn'
@@ -311,7 +433,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
             try:
                 source = discord.FFmpegPCMAudio(filename, **ffmpeg_options)
             except Exception as e:
-                logger.error(f"FFmpeg failed: {e}")
+                logger.error("FFmpeg failed: %s", e)
                 raise
             
             return cls(source, data=data)
@@ -325,7 +447,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                 await asyncio.sleep(3)
                 if voice_client and voice_client.is_connected():
                     await voice_client.disconnect()
-                    embed = create_embed("👋 Queue Finished", "All songs played. Disconnecting...", discord.Color.blue())
+                    embed = create_embed("👋 Queue Finished", "All songs played. Disconnecting...", BLUE)
                     await channel.send(embed=embed)
                 return
             
@@ -339,13 +461,13 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                 
                 def after_play(error):
                     if error:
-                        logger.error(f"Playback error for {title}: {error}")
+                        logger.error("Playback error for %s: %s", title, error)
                     
                     if hasattr(player, 'cleanup'):
                         try:
                             player.cleanup()
                         except Exception as e:
-                            logger.error(f"Cleanup error: {e}")
+                            logger.error("Cleanup error: %s", e)
                     
                     fut = asyncio.run_coroutine_threadsafe(
                         _schedule_next_if_connected(voice_client, guild_key, channel),
@@ -354,7 +476,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                     try:
                         fut.result(timeout=5)
                     except Exception as e:
-                        logger.error(f"Error scheduling next: {e}")
+                        logger.error("Error scheduling next: %s", e)
                 
                 if voice_client.is_playing():
                     voice_client.stop()
@@ -362,7 +484,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                 voice_client.play(player, after=after_play)
                 bot_state.now_playing[guild_key] = title
                 
-                embed = create_embed("🎵 Now Playing", f"**{title}**", discord.Color.blue())
+                embed = create_embed("🎵 Now Playing", f"**{title}**", BLUE)
                 if player.duration:
                     embed.add_field(name="Duration", value=format_duration(int(player.duration)), inline=True)
                 if bot_state.music_queues[guild_key]:
@@ -371,18 +493,18 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                 await channel.send(embed=embed)
                     
             except Exception as e:
-                logger.error(f"Error playing {title}: {e}")
-                embed = create_embed("❌ Playback Error", f"Couldn't play **{title}**. Skipping...", discord.Color.red())
+                logger.error("Error playing %s: %s", title, e)
+                embed = create_embed("❌ Playback Error", f"Couldn't play **{title}**. Skipping...", RED)
                 await channel.send(embed=embed)
                 await asyncio.sleep(1)
                 if bot_state.music_queues.get(guild_key):
                     await play_next_song(voice_client, guild_key, channel)
                 
         except Exception as e:
-            logger.exception(f"Unexpected error in play_next_song: {e}")
+            logger.exception("Unexpected error in play_next_song: %s", e)
             if guild_key in bot_state.music_queues:
                 bot_state.music_queues[guild_key].clear()
-            embed = create_embed("💥 Fatal Error", "Music playback failed. Queue cleared.", discord.Color.dark_red())
+            embed = create_embed("💥 Fatal Error", "Music playback failed. Queue cleared.", DARK_RED)
             await channel.send(embed=embed)
 
     async def _schedule_next_if_connected(voice_client, guild_key, channel):
@@ -423,7 +545,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                     if not entries:
                         return await interaction.followup.send("❌ No videos in playlist.")
                     
-                    embed = create_embed("📝 Adding Playlist", f"Processing {len(entries)} videos...", discord.Color.blue())
+                    embed = create_embed("📝 Adding Playlist", f"Processing {len(entries)} videos...", BLUE)
                     await interaction.followup.send(embed=embed)
                     
                     added = 0
@@ -437,7 +559,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                         except Exception:
                             continue
                     
-                    embed = create_embed("✅ Playlist Added", f"Added **{added}** songs!", discord.Color.green())
+                    embed = create_embed("✅ Playlist Added", f"Added **{added}** songs!", GREEN)
                     await interaction.channel.send(embed=embed)
                     
                     if not voice_client.is_playing() and not voice_client.is_paused():
@@ -461,16 +583,16 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
             bot_state.music_queues[guild_key].append((video_url, title))
             
             if voice_client.is_playing() or voice_client.is_paused():
-                embed = create_embed("✅ Added to Queue", f"**{title}**", discord.Color.green())
+                embed = create_embed("✅ Added to Queue", f"**{title}**", GREEN)
                 embed.add_field(name="Position", value=f"#{len(bot_state.music_queues[guild_key])}", inline=True)
             else:
-                embed = create_embed("🎵 Starting Playback", f"**{title}**", discord.Color.blue())
+                embed = create_embed("🎵 Starting Playback", f"**{title}**", BLUE)
                 await play_next_song(voice_client, guild_key, interaction.channel)
             
             await interaction.followup.send(embed=embed)
                         
         except Exception as e:
-            logger.error(f"Error in play command: {e}")
+            logger.error("Error in play command: %s", e)
             await interaction.followup.send("❌ Couldn't play that. Try a different search.")
 
     @bot.tree.command(name="stop", description="Stop and clear queue.")
@@ -486,7 +608,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
         if guild_key in bot_state.music_queues:
             bot_state.music_queues[guild_key].clear()
         
-        embed = create_embed("⏹️ Music Stopped", "Playback stopped and queue cleared.", discord.Color.orange())
+        embed = create_embed("⏹️ Music Stopped", "Playback stopped and queue cleared.", ORANGE)
         await interaction.response.send_message(embed=embed)
 
     @bot.tree.command(name="leave", description="Leave voice channel.")
@@ -502,7 +624,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
         if guild_key in bot_state.music_queues:
             bot_state.music_queues[guild_key].clear()
         
-        embed = create_embed("👋 Left Voice Channel", f"Disconnected from **{channel_name}**", discord.Color.blue())
+        embed = create_embed("👋 Left Voice Channel", f"Disconnected from **{channel_name}**", BLUE)
         await interaction.response.send_message(embed=embed)
 
     @bot.tree.command(name="queue", description="View music queue.")
@@ -513,10 +635,10 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
         current_song = bot_state.now_playing.get(guild_key)
         
         if not is_playing and (guild_key not in bot_state.music_queues or not bot_state.music_queues[guild_key]):
-            embed = create_embed("📋 Queue Empty", "No songs. Use `/play` to add!", discord.Color.orange())
+            embed = create_embed("📋 Queue Empty", "No songs. Use `/play` to add!", ORANGE)
             return await interaction.response.send_message(embed=embed)
         
-        embed = create_embed("🎵 Music Queue", "", discord.Color.blue())
+        embed = create_embed("🎵 Music Queue", "", BLUE)
         
         if is_playing and current_song:
             embed.add_field(name="▶️ Now Playing", value=current_song[:100], inline=False)
@@ -541,7 +663,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
             return await interaction.response.send_message("❌ Nothing playing!", ephemeral=True)
         
         voice_client.stop()
-        embed = create_embed("⏭️ Skipped", "Skipped to next song!", discord.Color.blue())
+        embed = create_embed("⏭️ Skipped", "Skipped to next song!", BLUE)
         await interaction.response.send_message(embed=embed)
 
     @bot.tree.command(name="shuffle", description="Shuffle the music queue.")
@@ -550,11 +672,11 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
         queue = bot_state.music_queues.get(guild_key)
 
         if not queue or len(queue) == 0:
-            embed = create_embed("📋 Queue Empty", "No songs to shuffle. Use `/play` to add.", discord.Color.orange())
+            embed = create_embed("📋 Queue Empty", "No songs to shuffle. Use `/play` to add.", ORANGE)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
         if len(queue) < 2:
-            embed = create_embed("🔀 Nothing To Shuffle", "Need at least 2 songs to shuffle.", discord.Color.orange())
+            embed = create_embed("🔀 Nothing To Shuffle", "Need at least 2 songs to shuffle.", ORANGE)
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
         try:
@@ -562,7 +684,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
             random.shuffle(q_list)
             bot_state.music_queues[guild_key] = deque(q_list)
 
-            embed = create_embed("🔀 Queue Shuffled", f"Shuffled **{len(q_list)}** songs.", discord.Color.green())
+            embed = create_embed("🔀 Queue Shuffled", f"Shuffled **{len(q_list)}** songs.", GREEN)
 
             upcoming = "\n".join(f"#{i+1} {t[1][:100]}" for i, t in enumerate(list(bot_state.music_queues[guild_key])[:5]))
             if upcoming:
@@ -570,8 +692,8 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
 
             await interaction.response.send_message(embed=embed)
         except Exception as e:
-            logger.error(f"Error shuffling queue: {e}")
-            embed = create_embed("❌ Shuffle Error", "Couldn't shuffle the queue.", discord.Color.red())
+            logger.error("Error shuffling queue: %s", e)
+            embed = create_embed("❌ Shuffle Error", "Couldn't shuffle the queue.", RED)
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
     # FIX: Added periodic cleanup task for inactive music queues
@@ -588,7 +710,7 @@ if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
                 cleaned += 1
         
         if cleaned > 0:
-            logger.info(f"Cleaned up {cleaned} inactive music queues")
+            logger.info("Cleaned up %s inactive music queues", cleaned)
 
 # ========== Trivia System ==========
 class TriviaView(View):
@@ -596,44 +718,47 @@ class TriviaView(View):
         super().__init__(timeout=Config.TRIVIA_TIMEOUT)
         self.user_id = user_id
         self.question_data = question_data
+        self.question = html.unescape(question_data['question'])
         self.correct = html.unescape(question_data['correct_answer'])
-        self.incorrect = [html.unescape(a) for a in question_data['incorrect_answers']]
-        self.options = self.incorrect + [self.correct]
-        random.shuffle(self.options)
+        self.incorrect = list(map(html.unescape, question_data['incorrect_answers']))
+        self.options = random.sample([*self.incorrect, self.correct], len(self.incorrect) + 1)
+        self.correct_idx = self.options.index(self.correct) + 1
         self.message = None
         self.answered = False
         
-        for idx, option in enumerate(self.options, 1):
+        self.option_buttons: List[Button] = []
+        for idx in range(1, len(self.options) + 1):
             btn = Button(label=str(idx), style=discord.ButtonStyle.primary, custom_id=f"option_{idx}", emoji="🔢")
-            btn.callback = self.create_callback(idx, option)
+            btn.callback = self.option_callback
             self.add_item(btn)
+            self.option_buttons.append(btn)
+        self.correct_btn = self.option_buttons[self.correct_idx - 1]
+    
+    async def option_callback(self, interaction: discord.Interaction):
+        if interaction.user.id != self.user_id:
+            return await interaction.response.send_message("Not your question! Use `/trivia`.", ephemeral=True)
+        if self.answered:
+            return await interaction.response.send_message("Already answered!", ephemeral=True)
+        self.answered = True
+        idx = int(interaction.data['custom_id'].split('_')[1])
+        await self.process_answer(interaction, idx, self.options[idx - 1])
     
-    def create_callback(self, idx: int, option: str):
-        async def callback(interaction: discord.Interaction):
-            if interaction.user.id != self.user_id:
-                return await interaction.response.send_message("Not your question! Use `/trivia`.", ephemeral=True)
-            if self.answered:
-                return await interaction.response.send_message("Already answered!", ephemeral=True)
-            self.answered = True
-            await self.process_answer(interaction, idx, option)
-        return callback
+    def reveal_answer(self):
+        """Disable every option and highlight the correct one"""
+        for btn in self.option_buttons:
+            btn.disabled = True
+            btn.style = discord.ButtonStyle.secondary
+        self.correct_btn.style = discord.ButtonStyle.success
+        self.correct_btn.emoji = "✅"
     
     async def process_answer(self, interaction: discord.Interaction, idx: int, selected_option: str):
-        is_correct = selected_option == self.correct
+        is_correct = idx == self.correct_idx
         
-        for child in self.children:
-            child.disabled = True
-            option_idx = int(child.custom_id.split('_')[1])
-            option_text = self.options[option_idx - 1]
-            
-            if option_text == self.correct:
-                child.style = discord.ButtonStyle.success
-                child.emoji = "✅"
-            elif option_idx == idx:
-                child.style = discord.ButtonStyle.danger if not is_correct else discord.ButtonStyle.success
-                child.emoji = "❌" if not is_correct else "✅"
-            else:
-                child.style = discord.ButtonStyle.secondary
+        self.reveal_answer()
+        if not is_correct:
+            selected_btn = self.option_buttons[idx - 1]
+            selected_btn.style = discord.ButtonStyle.danger
+            selected_btn.emoji = "❌"
         
         await interaction.response.edit_message(view=self)
         await self.send_result(interaction, is_correct, selected_option)
@@ -642,10 +767,10 @@ class TriviaView(View):
     async def send_result(self, interaction: discord.Interaction, is_correct: bool, selected_option: str):
         title = "🎉 Correct!" if is_correct else "❌ Incorrect"
         desc = f"Well done, {interaction.user.mention}!" if is_correct else f"{interaction.user.mention}, correct: **{self.correct}**"
-        color = discord.Color.green() if is_correct else discord.Color.red()
+        color = GREEN if is_correct else RED
         
         embed = create_embed(title, desc, color)
-        embed.add_field(name="Question", value=html.unescape(self.question_data['question']), inline=False)
+        embed.add_field(name="Question", value=self.question, inline=False)
         embed.add_field(name="Category", value=self.question_data['category'], inline=True)
         embed.add_field(name="Difficulty", value=self.question_data['difficulty'].capitalize(), inline=True)
         
@@ -660,24 +785,25 @@ class TriviaView(View):
             return
         
         self.answered = True
-        for child in self.children:
-            child.disabled = True
-            option_idx = int(child.custom_id.split('_')[1])
-            if self.options[option_idx - 1] == self.correct:
-                child.style = discord.ButtonStyle.success
-                child.emoji = "✅"
-            else:
-                child.style = discord.ButtonStyle.secondary
+        self.reveal_answer()
         
         try:
             embed = self.message.embeds[0]
             embed.title = "⏰ Time's Up!"
-            embed.color = discord.Color.dark_gray()
+            embed.color = DARK_GRAY
             embed.set_footer(text="Time's up! Use /trivia to try again.")
             await self.message.edit(embed=embed, view=self)
             await self.message.reply(f"⏰ Time's up! Answer: **{self.correct}**")
         except Exception as e:
-            logger.error(f"Error updating expired trivia: {e}")
+            logger.error("Error updating expired trivia: %s", e)
+
+_ANY_CATEGORY_OPTION = discord.SelectOption(label="Any Category", description="Random", value="0", emoji="🎲")
+_DIFFICULTY_OPTIONS = (
+    discord.SelectOption(label="Any Difficulty", value="any", emoji="🎲"),
+    discord.SelectOption(label="Easy", value="easy", emoji="🟢"),
+    discord.SelectOption(label="Medium", value="medium", emoji="🟡"),
+    discord.SelectOption(label="Hard", value="hard", emoji="🔴")
+)
 
 class TriviaSetupView(View):
     def __init__(self, interaction: discord.Interaction, categories: List[Dict[str, Any]]):
@@ -686,10 +812,11 @@ class TriviaSetupView(View):
         self.category = "0"
         self.difficulty = "any"
         self.categories = categories
+        self.category_names = {str(c["id"]): c["name"] for c in categories}
         self.setup_components()
     
     def setup_components(self):
-        category_options = [discord.SelectOption(label="Any Category", description="Random", value="0", emoji="🎲")]
+        category_options = [_ANY_CATEGORY_OPTION]
         for cat in self.categories[:23]:
             category_options.append(discord.SelectOption(label=cat["name"][:100], value=str(cat["id"])))
         
@@ -697,14 +824,8 @@ class TriviaSetupView(View):
         cat_select.callback = self.category_callback
         self.add_item(cat_select)
         
-        diff_options = [
-            discord.SelectOption(label="Any Difficulty", value="any", emoji="🎲"),
-            discord.SelectOption(label="Easy", value="easy", emoji="🟢"),
-            discord.SelectOption(label="Medium", value="medium", emoji="🟡"),
-            discord.SelectOption(label="Hard", value="hard", emoji="🔴")
-        ]
-        
-        diff_select = Select(placeholder="⚡ Choose difficulty...", options=diff_options, custom_id="difficulty_select")
+        # Copy so Select.add_option can never touch the shared options
+        diff_select = Select(placeholder="⚡ Choose difficulty...", options=list(_DIFFICULTY_OPTIONS), custom_id="difficulty_select")
         diff_select.callback = self.difficulty_callback
         self.add_item(diff_select)
         
@@ -714,7 +835,7 @@ class TriviaSetupView(View):
     
     async def category_callback(self, interaction: discord.Interaction):
         self.category = interaction.data['values'][0]
-        selected = next((c["name"] for c in self.categories if str(c["id"]) == self.category), "Any Category")
+        selected = self.category_names.get(self.category, "Any Category")
         await interaction.response.send_message(f"📂 Selected: **{selected}**", ephemeral=True)
     
     async def difficulty_callback(self, interaction: discord.Interaction):
@@ -726,7 +847,7 @@ class TriviaSetupView(View):
         for child in self.children:
             child.disabled = True
         
-        embed = create_embed("🔄 Loading Trivia...", "Fetching question...", discord.Color.yellow())
+        embed = create_embed("🔄 Loading Trivia...", "Fetching question...", YELLOW)
         await interaction.response.edit_message(embed=embed, view=self)
         await fetch_and_display_trivia(interaction, self.category, self.difficulty)
     
@@ -734,17 +855,33 @@ class TriviaSetupView(View):
         for child in self.children:
             child.disabled = True
         try:
-            embed = create_embed("⏰ Setup Expired", "Timed out. Use `/trivia` to try again.", discord.Color.dark_gray())
+            embed = create_embed("⏰ Setup Expired", "Timed out. Use `/trivia` to try again.", DARK_GRAY)
             await self.interaction.edit_original_response(embed=embed, view=self)
         except Exception as e:
-            logger.warning(f"Could not update expired setup: {e}")
+            logger.warning("Could not update expired setup: %s", e)
 
-@lru_cache(maxsize=1)
 async def fetch_categories() -> List[Dict[str, Any]]:
-    data = await safe_api_request(Config.TRIVIA_CATEGORIES_API)
-    
-    if data and "trivia_categories" in data:
-        return data["trivia_categories"]
+    """Fetch trivia categories at most once a day; concurrent callers share one request"""
+    if bot_state.categories_lock is None:
+        bot_state.categories_lock = asyncio.Lock()
+    async with bot_state.categories_lock:
+        now = time.monotonic()
+        expired = (bot_state.trivia_categories is None
+                   or now - bot_state.categories_fetched_at > Config.TRIVIA_CATEGORIES_TTL)
+        # After a failed attempt, wait out a short backoff instead of retrying on every call
+        may_retry = (bot_state.categories_attempted_at is None
+                     or now - bot_state.categories_attempted_at > Config.TRIVIA_CATEGORIES_RETRY)
+        if expired and may_retry:
+            bot_state.categories_attempted_at = now
+            data = await safe_api_request(Config.TRIVIA_CATEGORIES_API)
+            if data and "trivia_categories" in data:
+                bot_state.trivia_categories = data["trivia_categories"]
+                bot_state.categories_fetched_at = time.monotonic()
+            elif bot_state.trivia_categories is not None:
+                logger.warning("Failed to refresh categories, keeping cached list")
+        
+        if bot_state.trivia_categories is not None:
+            return bot_state.trivia_categories
     
     logger.warning("Failed to fetch categories, using fallback")
     return [
@@ -761,46 +898,72 @@ async def fetch_categories() -> List[Dict[str, Any]]:
         {"id": 27, "name": "Animals"}
     ]
 
-async def fetch_and_display_trivia(interaction: discord.Interaction, category_id: str = "0", difficulty: str = "any"):
-    params = {}
-    if category_id != "0":
-        params["category"] = category_id
-    if difficulty != "any":
-        params["difficulty"] = difficulty
+async def refill_trivia_questions(category_id: str, difficulty: str) -> deque:
+    """Refill one category/difficulty queue; concurrent callers share a single refill"""
+    key = (category_id, difficulty)
+    questions = bot_state.trivia_questions.setdefault(key, deque())
+    
+    async with bot_state.trivia_locks.setdefault(key, asyncio.Lock()):
+        if questions:
+            return questions
+        
+        batched = key not in bot_state.trivia_unbatched
+        params = {"amount": Config.TRIVIA_BATCH_SIZE if batched else 1}
+        if category_id != "0":
+            params["category"] = category_id
+        if difficulty != "any":
+            params["difficulty"] = difficulty
+        
+        data = await safe_api_request(Config.TRIVIA_API, params)
+        
+        # Code 1: fewer questions than requested exist, so remember the pair and fall back to single ones
+        if batched and data and data.get("response_code") == 1:
+            bot_state.trivia_unbatched.add(key)
+            await asyncio.sleep(Config.TRIVIA_RATE_LIMIT_SECONDS)
+            params["amount"] = 1
+            data = await safe_api_request(Config.TRIVIA_API, params)
+        
+        if data and data.get("response_code") == 0:
+            questions.extend(data.get("results", []))
     
-    data = await safe_api_request(Config.TRIVIA_API, params)
+    return questions
+
+async def fetch_and_display_trivia(interaction: discord.Interaction, category_id: str = "0", difficulty: str = "any"):
+    # Questions are fetched in batches per category/difficulty and served one at a time
+    questions = bot_state.trivia_questions.get((category_id, difficulty))
+    if not questions:
+        questions = await refill_trivia_questions(category_id, difficulty)
     
-    if not data or data.get("response_code") != 0 or not data.get("results"):
-        embed = create_embed("😅 No Questions", "Try different settings!", discord.Color.orange())
+    if not questions:
+        embed = create_embed("😅 No Questions", "Try different settings!", ORANGE)
         return await interaction.edit_original_response(embed=embed, view=None)
     
-    question_data = data["results"][0]
+    question_data = questions.popleft()
     view = TriviaView(interaction.user.id, question_data)
     
-    question_text = html.unescape(question_data["question"])
+    question_text = view.question
     category = question_data["category"]
     difficulty_level = question_data["difficulty"]
     
     difficulty_emojis = {"easy": "🟢", "medium": "🟡", "hard": "🔴"}
     difficulty_emoji = difficulty_emojis.get(difficulty_level, "⚪")
     
-    embed = create_embed("🧠 Trivia Question", f"**{question_text}**", discord.Color.blurple())
+    options_text = "\n".join(f"{idx}️⃣ {option}" for idx, option in enumerate(view.options, 1))
+    embed = create_embed("🧠 Trivia Question", f"**{question_text}**\n\n{options_text}", BLURPLE)
     embed.add_field(name="📂 Category", value=category, inline=True)
     embed.add_field(name=f"{difficulty_emoji} Difficulty", value=difficulty_level.capitalize(), inline=True)
     embed.add_field(name="⏱️ Time", value=f"{Config.TRIVIA_TIMEOUT}s", inline=True)
     
-    for idx, option in enumerate(view.options, 1):
-        embed.add_field(name=f"{idx}️⃣ Option {idx}", value=option, inline=False)
-    
     embed.set_footer(text=f"Requested by {interaction.user.display_name}", icon_url=interaction.user.display_avatar.url)
     
     msg = await interaction.edit_original_response(embed=embed, view=view)
     view.message = msg
 
 # ========== Bot Commands ==========
-@bot.tree.command(name="help", description="Show available commands.")
-async def help_command(interaction: discord.Interaction):
-    embed = create_embed("🤖 Bot Commands", "All available commands:", discord.Color.blue())
+@lru_cache(maxsize=1)
+def build_help_embed() -> discord.Embed:
+    """The help embed never changes after login, so build it once"""
+    embed = create_embed("🤖 Bot Commands", "All available commands:", BLUE)
     
     embed.add_field(
         name="🎲 Fun Commands",
@@ -823,22 +986,27 @@ async def help_command(interaction: discord.Interaction):
     
     embed.set_footer(text="Use slash commands (/) to interact!")
     embed.set_thumbnail(url=bot.user.display_avatar.url)
-    await interaction.response.send_message(embed=embed)
+    return embed
+
+@bot.tree.command(name="help", description="Show available commands.")
+async def help_command(interaction: discord.Interaction):
+    await interaction.response.send_message(embed=build_help_embed())
 
 @bot.tree.command(name="fact", description="Get a random fact.")
 @rate_limit
 async def fact_command(interaction: discord.Interaction):
-    await interaction.response.defer()
-    
+    # randfacts picks from a list loaded at import, so answer directly instead of deferring
     try:
         fact = randfacts.get_fact()
-        embed = create_embed("🧠 Random Fact", fact, discord.Color.green())
+        embed = create_embed("🧠 Random Fact", fact, GREEN)
         embed.set_footer(text=f"Requested by {interaction.user.display_name}", icon_url=interaction.user.display_avatar.url)
-        await interaction.followup.send(embed=embed)
+        await interaction.response.send_message(embed=embed)
     except Exception as e:
-        logger.error(f"Error getting fact: {e}")
-        embed = create_embed("❌ Error", "Couldn't fetch fact. Try again later.", discord.Color.red())
-        await interaction.followup.send(embed=embed)
+        logger.error("Error getting fact: %s", e)
+        embed = create_embed("❌ Error", "Couldn't fetch fact. Try again later.", RED)
+        await interaction.response.send_message(embed=embed)
+
+DAD_JOKE_REACTIONS = ("😂", "🤣", "😅", "😆", "🙃", "😏")
 
 @bot.tree.command(name="dadjoke", description="Get a random dad joke!")
 @rate_limit
@@ -863,12 +1031,11 @@ async def dadjoke_command(interaction: discord.Interaction):
             embed = create_embed(
                 "😄 Dad Joke",
                 joke_text,
-                discord.Color.gold()
+                GOLD
             )
             
             # Add a footer with emoji reactions
-            reactions = ["😂", "🤣", "😅", "😆", "🙃", "😏"]
-            footer_emoji = random.choice(reactions)
+            footer_emoji = random.choice(DAD_JOKE_REACTIONS)
             embed.set_footer(
                 text=f"{footer_emoji} Requested by {interaction.user.display_name} • ID: {joke_id}",
                 icon_url=interaction.user.display_avatar.url
@@ -882,29 +1049,29 @@ async def dadjoke_command(interaction: discord.Interaction):
             embed = create_embed(
                 "❌ Error",
                 "Couldn't fetch a dad joke right now. Try again!",
-                discord.Color.red()
+                RED
             )
             await interaction.followup.send(embed=embed)
             
     except Exception as e:
-        logger.error(f"Error getting dad joke: {e}")
+        logger.error("Error getting dad joke: %s", e)
         embed = create_embed(
             "❌ Error",
             "Something went wrong fetching the joke. Try again later!",
-            discord.Color.red()
+            RED
         )
         await interaction.followup.send(embed=embed)
 
 @bot.tree.command(name="ping", description="Check bot latency.")
 async def ping_command(interaction: discord.Interaction):
     start = datetime.datetime.now(timezone.utc)
-    embed = create_embed("🏓 Pong!", "Checking...", discord.Color.yellow())
+    embed = create_embed("🏓 Pong!", "Checking...", YELLOW)
     await interaction.response.send_message(embed=embed)
     
     response_time = (datetime.datetime.now(timezone.utc) - start).total_seconds() * 1000
     ws_latency = round(bot.latency * 1000)
     
-    embed = create_embed("🏓 Pong!", "Connection status:", discord.Color.green())
+    embed = create_embed("🏓 Pong!", "Connection status:", GREEN)
     embed.add_field(name="WebSocket", value=f"{ws_latency}ms", inline=True)
     embed.add_field(name="Response", value=f"{response_time:.1f}ms", inline=True)
     embed.add_field(name="Status", value="✅ Online", inline=True)
@@ -920,29 +1087,29 @@ async def ping_command(interaction: discord.Interaction):
 @app_commands.describe(min_num="Minimum", max_num="Maximum")
 async def number_command(interaction: discord.Interaction, min_num: int, max_num: int):
     if min_num > max_num:
-        embed = create_embed("❌ Invalid Range", f"Min ({min_num}) must be ≤ max ({max_num}).", discord.Color.red())
+        embed = create_embed("❌ Invalid Range", f"Min ({min_num}) must be ≤ max ({max_num}).", RED)
         return await interaction.response.send_message(embed=embed, ephemeral=True)
     
     if max_num - min_num > 1000000:
-        embed = create_embed("❌ Range Too Large", "Max range: 1,000,000.", discord.Color.red())
+        embed = create_embed("❌ Range Too Large", "Max range: 1,000,000.", RED)
         return await interaction.response.send_message(embed=embed, ephemeral=True)
     
-    result = random.randint(min_num, max_num)
-    embed = create_embed("🎲 Random Number", f"Between **{min_num}** and **{max_num}**:", discord.Color.blue())
+    result = random.randrange(min_num, max_num + 1)
+    embed = create_embed("🎲 Random Number", f"Between **{min_num}** and **{max_num}**:", BLUE)
     embed.add_field(name="Result", value=f"**{result}**", inline=False)
     embed.set_footer(text=f"Generated for {interaction.user.display_name}", icon_url=interaction.user.display_avatar.url)
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="coin", description="Flip a coin.")
 async def coin_command(interaction: discord.Interaction):
-    embed = create_embed("🪙 Flipping...", "Coin spinning...", discord.Color.yellow())
+    embed = create_embed("🪙 Flipping...", "Coin spinning...", YELLOW)
     await interaction.response.send_message(embed=embed)
     await asyncio.sleep(1)
     
-    result = "Heads" if random.randint(0, 1) == 0 else "Tails"
+    result = "Heads" if random.getrandbits(1) else "Tails"
     emoji = "👑" if result == "Heads" else "🎯"
     
-    embed = create_embed("🪙 Coin Flip", f"Landed on **{result}**! {emoji}", discord.Color.green())
+    embed = create_embed("🪙 Coin Flip", f"Landed on **{result}**! {emoji}", GREEN)
     embed.set_footer(text=f"Flipped by {interaction.user.display_name}", icon_url=interaction.user.display_avatar.url)
     await interaction.edit_original_response(embed=embed)
 
@@ -955,7 +1122,7 @@ async def trivia_command(interaction: discord.Interaction):
         categories = await fetch_categories()
         view = TriviaSetupView(interaction, categories)
         
-        embed = create_embed("🧠 Trivia Setup", "Configure your question:", discord.Color.blue())
+        embed = create_embed("🧠 Trivia Setup", "Configure your question:", BLUE)
         embed.add_field(name="📂 Categories", value=f"{len(categories)} available", inline=True)
         embed.add_field(name="⚡ Difficulties", value="Easy, Medium, Hard", inline=True)
         embed.add_field(name="⏱️ Time", value=f"{Config.TRIVIA_TIMEOUT}s", inline=True)
@@ -963,8 +1130,8 @@ async def trivia_command(interaction: discord.Interaction):
         
         await interaction.followup.send(embed=embed, view=view)
     except Exception as e:
-        logger.error(f"Error in trivia setup: {e}")
-        embed = create_embed("❌ Setup Error", "Try again later.", discord.Color.red())
+        logger.error("Error in trivia setup: %s", e)
+        embed = create_embed("❌ Setup Error", "Try again later.", RED)
         await interaction.followup.send(embed=embed)
 
 @bot.tree.command(name="weather", description="Get weather information.")
@@ -973,46 +1140,84 @@ async def trivia_command(interaction: discord.Interaction):
 async def weather_command(interaction: discord.Interaction, city: str):
     city = city.strip()
     if not city or len(city) < Config.MIN_CITY_NAME_LENGTH:
-        embed = create_embed("❌ Invalid Input", "Provide valid city name!", discord.Color.red())
+        embed = create_embed("❌ Invalid Input", "Provide valid city name!", RED)
         return await interaction.response.send_message(embed=embed, ephemeral=True)
     
     if len(city) > Config.MAX_CITY_NAME_LENGTH:
-        embed = create_embed("❌ Too Long", f"Max {Config.MAX_CITY_NAME_LENGTH} chars!", discord.Color.red())
+        embed = create_embed("❌ Too Long", f"Max {Config.MAX_CITY_NAME_LENGTH} chars!", RED)
         return await interaction.response.send_message(embed=embed, ephemeral=True)
     
     await interaction.response.defer()
     
     try:
-        embed = create_embed("🔍 Fetching...", f"Getting weather for **{city}**...", discord.Color.yellow())
+        embed = create_embed("🔍 Fetching...", f"Getting weather for **{city}**...", YELLOW)
         await interaction.edit_original_response(embed=embed)
         
-        async with python_weather.Client(unit=python_weather.IMPERIAL) as client:
-            weather = await client.get(city)
-            embed = create_weather_embed(weather, interaction.user)
-            await interaction.edit_original_response(embed=embed)
+        client = await bot_state.get_weather_client()
+        weather = await client.get(city)
+        embed = create_weather_embed(weather, interaction.user)
+        await interaction.edit_original_response(embed=embed)
             
     except RequestError as e:
-        logger.error(f"Weather API error: {e}")
-        embed = create_embed("🌐 API Error", f"Error for '{city}'. Check city name.", discord.Color.red())
+        logger.error("Weather API error: %s", e)
+        embed = create_embed("🌐 API Error", f"Error for '{city}'. Check city name.", RED)
         await interaction.edit_original_response(embed=embed)
     except Error as e:
-        logger.error(f"Weather error: {e}")
-        embed = create_embed("❌ Weather Error", f"Couldn't get data for '{city}'.", discord.Color.red())
+        logger.error("Weather error: %s", e)
+        embed = create_embed("❌ Weather Error", f"Couldn't get data for '{city}'.", RED)
         await interaction.edit_original_response(embed=embed)
     except Exception as e:
-        logger.error(f"Unexpected weather error: {e}")
-        embed = create_embed("💥 Error", "Something went wrong. Try later.", discord.Color.red())
+        logger.error("Unexpected weather error: %s", e)
+        embed = create_embed("💥 Error", "Something went wrong. Try later.", RED)
         await interaction.edit_original_response(embed=embed)
 
+# Forecast attribute names differ between python_weather versions
+_TEMP_HIGH_ATTRS = ('highest', 'high', 'temperature')
+_TEMP_LOW_ATTRS = ('lowest', 'low')
+
+def _first_attr(obj, names: Tuple[str, ...]):
+    for name in names:
+        value = getattr(obj, name, None)
+        if value is not None:
+            return value
+    return None
+
+_DAY_LABELS = ("Today", "Tomorrow")
+
+def _build_day_line(i: int, day) -> str:
+    """Format one forecast day as a single embed line"""
+    if i < len(_DAY_LABELS):
+        day_name = _DAY_LABELS[i]
+    else:
+        date = getattr(day, 'date', None)
+        day_name = date.strftime('%A') if date else f"Day {i+1}"
+    
+    kind = getattr(day, 'kind', None)
+    emoji = getattr(kind, 'emoji', DEFAULT_WEATHER_EMOJI)
+    
+    desc = getattr(day, 'description', None)
+    if desc is None:
+        desc = str(kind) if kind is not None else ""
+    
+    temp_high = _first_attr(day, _TEMP_HIGH_ATTRS)
+    temp_low = _first_attr(day, _TEMP_LOW_ATTRS)
+    
+    temp_info = f"H: {temp_high}°F, L: {temp_low}°F" if temp_high is not None and temp_low is not None else f"{temp_high}°F" if temp_high is not None else ""
+    
+    line = f"{emoji} **{day_name}**: {desc}"
+    if temp_info:
+        line += f" • {temp_info}"
+    return line + "\n"
+
 def create_weather_embed(weather, user: discord.User) -> discord.Embed:
-    weather_emoji = getattr(weather.kind, 'emoji', '🌤️')
+    weather_emoji = getattr(weather.kind, 'emoji', DEFAULT_WEATHER_EMOJI)
     date_str = weather.datetime.strftime('%A, %B %d, %Y')
     
     title = f"{weather_emoji} Weather in {weather.location}"
     description = f"**{weather.description}** • **{weather.temperature}°F**\n{date_str}"
     
     temp = weather.temperature
-    color = discord.Color.red() if temp >= 80 else discord.Color.orange() if temp >= 60 else discord.Color.blue() if temp >= 40 else discord.Color.dark_blue()
+    color = RED if temp >= 80 else ORANGE if temp >= 60 else BLUE if temp >= 40 else DARK_BLUE
     
     embed = create_embed(title, description, color)
     
@@ -1026,8 +1231,9 @@ def create_weather_embed(weather, user: discord.User) -> discord.Embed:
     wind_info = f"{weather.wind_speed} mph"
     if weather.wind_direction:
         direction = str(weather.wind_direction)
-        if hasattr(weather.wind_direction, "emoji"):
-            direction += f" {weather.wind_direction.emoji}"
+        direction_emoji = getattr(weather.wind_direction, "emoji", None)
+        if direction_emoji:
+            direction += f" {direction_emoji}"
         wind_info += f" {direction}"
     embed.add_field(name="💨 Wind", value=wind_info, inline=True)
     
@@ -1039,28 +1245,13 @@ def create_weather_embed(weather, user: discord.User) -> discord.Embed:
     
     if weather.ultraviolet:
         uv_text = str(weather.ultraviolet)
-        if hasattr(weather.ultraviolet, "index"):
-            uv_index = weather.ultraviolet.index
+        uv_index = getattr(weather.ultraviolet, "index", None)
+        if uv_index is not None:
             uv_text = f"{uv_index}/10" + (" ⚠️" if uv_index >= 8 else " 🟡" if uv_index >= 6 else "")
         embed.add_field(name="☀️ UV Index", value=uv_text, inline=True)
     
     if weather.daily_forecasts:
-        forecast_text = ""
-        for i, day in enumerate(weather.daily_forecasts[:4]):
-            day_name = "Today" if i == 0 else "Tomorrow" if i == 1 else day.date.strftime('%A') if hasattr(day, 'date') else f"Day {i+1}"
-            emoji = getattr(getattr(day, 'kind', None), 'emoji', '🌤️')
-            
-            desc = day.description if hasattr(day, 'description') else str(day.kind) if hasattr(day, 'kind') else ""
-            
-            temp_high = getattr(day, 'highest', None) or getattr(day, 'high', None) or getattr(day, 'temperature', None)
-            temp_low = getattr(day, 'lowest', None) or getattr(day, 'low', None)
-            
-            temp_info = f"H: {temp_high}°F, L: {temp_low}°F" if temp_high and temp_low else f"{temp_high}°F" if temp_high else ""
-            
-            forecast_text += f"{emoji} **{day_name}**: {desc}"
-            if temp_info:
-                forecast_text += f" • {temp_info}"
-            forecast_text += "\n"
+        forecast_text = "".join(_build_day_line(i, day) for i, day in enumerate(weather.daily_forecasts[:4]))
         
         if forecast_text:
             embed.add_field(name="📅 Forecast", value=forecast_text, inline=False)
@@ -1069,18 +1260,51 @@ def create_weather_embed(weather, user: discord.User) -> discord.Embed:
     return embed
 
 # ========== Bot Events ==========
+def command_tree_hash(guild_id: Optional[int]) -> str:
+    """Fingerprint the registered slash commands and where they are synced"""
+    payload = {
+        "application": bot.application_id,
+        "guild": guild_id,
+        "commands": [c.to_dict(bot.tree) for c in bot.tree.get_commands()],
+    }
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+async def setup_hook():
+    """One-time async startup work, run before the gateway connects"""
+    await bot_state.initialize()
+    # Warm the category cache in the background so the gateway connect isn't held up by opentdb
+    bot_state.categories_task = asyncio.create_task(fetch_categories())
+
+bot.setup_hook = setup_hook
+
 @bot.event
 async def on_ready():
-    logger.info(f'🤖 {bot.user} connected!')
-    logger.info(f'📊 {len(bot.guilds)} guilds, {len(bot.users)} users')
-    
-    await bot_state.initialize()
+    logger.info('🤖 %s connected!', bot.user)
+    logger.info('📊 %s guilds, %s users', len(bot.guilds), len(bot.users))
     
     try:
-        synced = await bot.tree.sync()
-        logger.info(f'✅ Synced {len(synced)} commands')
+        sync_guild_id = get_settings().sync_guild_id
+        tree_hash = command_tree_hash(sync_guild_id)
+        hash_file = Path(__file__).resolve().parent / Config.TREE_HASH_FILE
+        
+        # on_ready fires on every reconnect; only sync when the commands actually changed
+        if hash_file.exists() and hash_file.read_text().strip() == tree_hash:
+            logger.info('✅ Command tree unchanged, skipping sync')
+        else:
+            if sync_guild_id:
+                # Guild-scoped sync is applied instantly instead of propagating globally
+                guild = discord.Object(id=sync_guild_id)
+                bot.tree.copy_global_to(guild=guild)
+                synced = await bot.tree.sync(guild=guild)
+            else:
+                synced = await bot.tree.sync()
+            logger.info('✅ Synced %s commands', len(synced))
+            try:
+                hash_file.write_text(tree_hash)
+            except OSError as e:
+                logger.warning("Could not write command tree hash to %s: %s", hash_file, e)
     except Exception as e:
-        logger.error(f'❌ Failed to sync: {e}')
+        logger.error('❌ Failed to sync: %s', e)
     
     activity = discord.Activity(type=discord.ActivityType.listening, name=f"/help • {len(bot.guilds)} servers")
     await bot.change_presence(activity=activity)
@@ -1094,12 +1318,12 @@ async def on_ready():
 
 @bot.event
 async def on_guild_join(guild):
-    logger.info(f'📥 Joined: {guild.name}')
+    logger.info('📥 Joined: %s', guild.name)
     activity = discord.Activity(type=discord.ActivityType.listening, name=f"/help • {len(bot.guilds)} servers")
     await bot.change_presence(activity=activity)
     
     if guild.system_channel:
-        embed = create_embed("👋 Hello!", f"Thanks for adding me!\n\nUse `/help` to see commands.", discord.Color.green())
+        embed = create_embed("👋 Hello!", f"Thanks for adding me!\n\nUse `/help` to see commands.", GREEN)
         try:
             await guild.system_channel.send(embed=embed)
         except discord.Forbidden:
@@ -1107,7 +1331,7 @@ async def on_guild_join(guild):
 
 @bot.event
 async def on_guild_remove(guild):
-    logger.info(f'📤 Left: {guild.name}')
+    logger.info('📤 Left: %s', guild.name)
     guild_key = str(guild.id)
     bot_state.music_queues.pop(guild_key, None)
     activity = discord.Activity(type=discord.ActivityType.listening, name=f"/help • {len(bot.guilds)} servers")
@@ -1115,18 +1339,18 @@ async def on_guild_remove(guild):
 
 @bot.event
 async def on_command_error(ctx, error):
-    logger.error(f'Command error: {error}', exc_info=error)
+    logger.error('Command error: %s', error, exc_info=error)
 
 @bot.event
 async def on_application_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
-    logger.error(f'Slash command error: {error}')
+    logger.error('Slash command error: %s', error)
     
     if isinstance(error, app_commands.CommandOnCooldown):
-        embed = create_embed("⏰ Cooldown", f"Try again in {error.retry_after:.1f}s.", discord.Color.orange())
+        embed = create_embed("⏰ Cooldown", f"Try again in {error.retry_after:.1f}s.", ORANGE)
     elif isinstance(error, app_commands.MissingPermissions):
-        embed = create_embed("🔒 No Permission", "You can't use this command.", discord.Color.red())
+        embed = create_embed("🔒 No Permission", "You can't use this command.", RED)
     else:
-        embed = create_embed("💥 Error", "Unexpected error. Try later.", discord.Color.red())
+        embed = create_embed("💥 Error", "Unexpected error. Try later.", RED)
     
     try:
         if interaction.response.is_done():
@@ -1134,7 +1358,7 @@ async def on_application_command_error(interaction: discord.Interaction, error:
         else:
             await interaction.response.send_message(embed=embed, ephemeral=True)
     except Exception as e:
-        logger.error(f"Couldn't send error message: {e}")
+        logger.error("Couldn't send error message: %s", e)
 
 @bot.event
 async def on_voice_state_update(member, before, after):
@@ -1164,8 +1388,12 @@ async def cleanup_resources():
     if status_update_task.is_running():
         status_update_task.cancel()
     
-    if YT_DLP_AVAILABLE and VOICE_AVAILABLE and cleanup_inactive_queues.is_running():
-        cleanup_inactive_queues.cancel()
+    if YT_DLP_AVAILABLE and VOICE_AVAILABLE:
+        if cleanup_inactive_queues.is_running():
+            cleanup_inactive_queues.cancel()
+        # Let in-flight extractions finish before closing the instances they use
+        await asyncio.get_running_loop().run_in_executor(None, ytdl_executor.shutdown)
+        close_ytdl_instances()
     
     # Close HTTP session
     await bot_state.cleanup()
@@ -1177,7 +1405,7 @@ async def cleanup_resources():
                 try:
                     await guild.voice_client.disconnect()
                 except Exception as e:
-                    logger.error(f"Error disconnecting from {guild.name}: {e}")
+                    logger.error("Error disconnecting from %s: %s", guild.name, e)
     
     # Clear all queues
     bot_state.music_queues.clear()
@@ -1186,112 +1414,81 @@ async def cleanup_resources():
     
     logger.info("✅ Cleanup complete")
 
-# FIX: Proper signal handler that works with asyncio
-def setup_signal_handlers(loop):
-    """Setup signal handlers that properly work with asyncio"""
+# ========== Startup ==========
+class HealthServer(uvicorn.Server):
+    """Uvicorn server that leaves SIGINT/SIGTERM to setup_signal_handlers"""
+    
+    @contextlib.contextmanager
+    def capture_signals(self):
+        # Uvicorn would otherwise capture signals here and re-raise them after serving
+        yield
+
+def setup_signal_handlers(loop, server: uvicorn.Server):
+    """Make SIGINT/SIGTERM stop Uvicorn; its exit then closes the bot and runs cleanup once"""
     def handle_signal(signum):
-        logger.info(f"📥 Received signal {signum}, initiating shutdown...")
-        # Set the shutdown event
-        bot_state.shutdown_event.set()
-        # Schedule the cleanup
-        asyncio.create_task(graceful_shutdown())
+        logger.info("📥 Received signal %s, initiating shutdown...", signum)
+        server.should_exit = True
     
     if sys.platform != 'win32':
         for sig in (signal.SIGINT, signal.SIGTERM):
-            loop.add_signal_handler(sig, lambda s=sig: handle_signal(s))
+            loop.add_signal_handler(sig, handle_signal, sig)
     else:
         # Windows doesn't support add_signal_handler
-        signal.signal(signal.SIGINT, lambda s, f: handle_signal(s))
-        signal.signal(signal.SIGTERM, lambda s, f: handle_signal(s))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda s, f: loop.call_soon_threadsafe(handle_signal, s))
+
+async def serve_web_app(server: uvicorn.Server):
+    """Serve the health app with Uvicorn on the bot's event loop"""
+    logger.info("🌐 Starting web server on port %s", server.config.port)
+    await server.serve()
+    
+    # The web server only stops on shutdown, so take the bot down with it
+    if not bot.is_closed():
+        await bot.close()
 
-async def graceful_shutdown():
-    """Perform graceful shutdown of the bot"""
-    logger.info("🛑 Starting graceful shutdown...")
+async def run_services(settings: Settings):
+    """Run the Discord bot and the web server together on one event loop"""
+    loop = asyncio.get_running_loop()
+    logger.info("🔁 Event loop: %s.%s", type(loop).__module__, type(loop).__name__)
+    config = uvicorn.Config(app, host="0.0.0.0", port=settings.port, http="auto", log_level="warning", access_log=False)
+    server = HealthServer(config)
+    setup_signal_handlers(loop, server)
     try:
+        await asyncio.gather(serve_web_app(server), bot.start(settings.discord_token))
+    finally:
+        server.should_exit = True
         await cleanup_resources()
-        await bot.close()
+        if not bot.is_closed():
+            await bot.close()
         logger.info("👋 Bot shutdown complete")
-    except Exception as e:
-        logger.error(f"Error during shutdown: {e}")
-    finally:
-        # Force exit if we're still running
-        sys.exit(0)
 
-# ========== Startup ==========
-def start_discord_bot():
-    """FIX: Better bot startup with proper signal handling"""
+def start_discord_bot(settings: Settings):
+    """Start the bot and web server, exiting on fatal startup errors"""
     try:
         logger.info("🚀 Starting Discord bot...")
-        
-        # Setup signal handlers before starting
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        setup_signal_handlers(loop)
-        
-        is_deployment = os.getenv("DEPLOYMENT") == "true" or "gunicorn" in os.environ.get("SERVER_SOFTWARE", "")
-        
-        if is_deployment:
-            logger.info("🔧 Deployment mode")
-            bot.run(DISCORD_TOKEN, log_handler=None)
-        else:
-            logger.info("🔧 Development mode")
-            bot.run(DISCORD_TOKEN)
-            
+        if UVLOOP_AVAILABLE:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(run_services(settings))
     except discord.LoginFailure:
         logger.critical("❌ Invalid Discord token!")
         sys.exit(1)
     except discord.HTTPException as e:
-        logger.critical(f"❌ Discord HTTP error: {e}")
+        logger.critical("❌ Discord HTTP error: %s", e)
         sys.exit(1)
     except KeyboardInterrupt:
         logger.info("⏹️ Keyboard interrupt received")
     except Exception as e:
-        logger.critical(f"💥 Bot startup failed: {e}", exc_info=True)
+        logger.critical("💥 Bot startup failed: %s", e, exc_info=True)
         sys.exit(1)
-    finally:
-        try:
-            loop = asyncio.get_event_loop()
-            if not loop.is_closed():
-                loop.run_until_complete(cleanup_resources())
-                loop.close()
-        except Exception as e:
-            logger.error(f"Error during final cleanup: {e}")
-
-def start_flask_server():
-    """Start Flask server in a separate function"""
-    port = int(os.getenv("PORT", 5000))
-    logger.info(f"🌐 Starting Flask server on port {port}")
-    app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
 
 # ========== Entry Point ==========
 if __name__ == "__main__":
-    # FIX: Use multiprocessing instead of threading for proper isolation
-    import multiprocessing
-    
-    logger.info("🚀 Starting bot with separate processes...")
-    
-    # Start Flask in a separate process
-    flask_process = multiprocessing.Process(target=start_flask_server, daemon=True)
-    flask_process.start()
-    
-    # Start Discord bot in main process (so signal handling works properly)
-    try:
-        start_discord_bot()
-    finally:
-        # Cleanup Flask process
-        if flask_process.is_alive():
-            logger.info("Terminating Flask process...")
-            flask_process.terminate()
-            flask_process.join(timeout=5)
-            if flask_process.is_alive():
-                flask_process.kill()
+    start_discord_bot(get_settings())
 
 else:
-    # FIX: When imported as a module (e.g., by gunicorn), don't start bot in thread
-    # Instead, provide separate entry points
+    # When imported as a module (e.g., by an ASGI server), don't start the bot
     logger.warning("⚠️ Module imported - Discord bot not started")
-    logger.warning("⚠️ Run this file directly with 'python bot.py' to start both services")
-    logger.warning("⚠️ Or deploy Discord bot and Flask separately for production")
+    logger.warning("⚠️ Run this file directly with 'python main.py' to start both services")
     
-    # Only export Flask app for WSGI servers
-    application = app
\ No newline at end of file
+    # Only export the ASGI app for external servers
+    application = app